@@ -4,13 +4,13 @@ Enterprise flow: Document Extraction (Step 1) → Standalone OSINT (Step 2).
 """
 
 import os
-import tempfile
-from pathlib import Path
+from typing import TYPE_CHECKING
 
-import fitz
 import streamlit as st
 
-from core import AdverseMediaAgent
+if TYPE_CHECKING:
+    # Imported lazily in _build_agent: core pulls in PyMuPDF, LangChain and the LLM SDKs
+    from core import AdverseMediaAgent
 
 # Load .env (GROQ_API_KEY, TAVILY_API_KEY)
 try:
@@ -27,20 +27,17 @@ st.set_page_config(
 )
 
 # Session state
-if "extracted" not in st.session_state:
-    st.session_state.extracted = None
-if "pdf_context" not in st.session_state:
-    st.session_state.pdf_context = None
-if "search_term" not in st.session_state:
-    st.session_state.search_term = ""
-if "last_report" not in st.session_state:
-    st.session_state.last_report = None
-if "last_search_data" not in st.session_state:
-    st.session_state.last_search_data = None
-if "osint_entity_input" not in st.session_state:
-    st.session_state.osint_entity_input = ""
-if "tavily_credits" not in st.session_state:
-    st.session_state.tavily_credits = 280
+_DEFAULTS = {
+    "extracted": None,
+    "pdf_context": None,
+    "search_term": "",
+    "last_report": None,
+    "last_search_data": None,
+    "osint_entity_input": "",
+    "osint_entity_input_norm": "",
+    "tavily_credits": 280,
+}
+st.session_state.update({k: v for k, v in _DEFAULTS.items() if k not in st.session_state})
 
 # --- Sidebar: Clear visual flow ---
 st.sidebar.title("⚙️ Engine Settings")
@@ -83,17 +80,36 @@ if not tavily_key:
     )
 else:
     st.sidebar.metric("Tavily Credits Remaining", st.session_state.tavily_credits)
+    if st.sidebar.button(
+        "Refresh OSINT cache",
+        key="clear_osint_cache",
+        help="Repeat searches for the same entity are served from a 24h cache at no credit cost. Clear it to force fresh results.",
+    ):
+        from core import clear_osint_cache
+
+        st.sidebar.caption(f"Cleared {clear_osint_cache()} cached search(es).")
+
+@st.cache_resource(show_spinner=False)
+def _build_agent(backend: str, groq_api_key: str | None, tavily_api_key: str) -> "AdverseMediaAgent":
+    """One agent per backend/key combination, shared across reruns and sessions.
+
+    tavily_api_key is only part of the cache key (the agent reads it from env),
+    so rotating the key in .env builds a fresh agent.
+    """
+    from core import AdverseMediaAgent
+
+    return AdverseMediaAgent(
+        backend=backend,
+        groq_api_key=groq_api_key,
+    )
 
 def _get_agent():
-    """Build agent from current sidebar backend; uses env for Groq and Tavily."""
+    """Return the cached agent for the current sidebar backend; uses env for Groq and Tavily."""
     if not tavily_key:
         raise ValueError("TAVILY_API_KEY is not set. Add it to .env for OSINT search.")
     if backend == "groq" and not (groq_key and groq_key.strip()):
         raise ValueError("GROQ_API_KEY is not set. Add it to .env to use Groq.")
-    return AdverseMediaAgent(
-        backend=backend,
-        groq_api_key=(groq_key or "").strip() or None,
-    )
+    return _build_agent(backend, (groq_key or "").strip() or None, tavily_key)
 
 def _model_label() -> str:
     if backend == "ollama":
@@ -105,172 +121,181 @@ st.title("Secure document handling")
 st.caption(f"Model active: **{_model_label()}**")
 st.markdown("---")
 
-# ----- Step 1: Document upload & extraction (unchanged) -----
-st.subheader("Step 1: Document upload & extraction")
-uploaded_file = st.file_uploader(
-    "Choose a PDF document",
-    type=["pdf"],
-    help="Only PDF files are supported.",
-    key="pdf_upload",
-)
-
-extract_clicked = st.button("Extract Information", type="primary", key="extract_btn")
+# ----- Step 1: Document upload & extraction -----
+# Fragments rerun on their own widget interactions (upload, Load buttons, typing)
+# without re-executing the rest of the page; anything that changes another
+# section calls st.rerun() for a full-app run.
+@st.fragment
+def _document_extraction() -> None:
+    """Step 1: upload a PDF, extract structured fields, show them read-only."""
+    st.subheader("Step 1: Document upload & extraction")
+    uploaded_file = st.file_uploader(
+        "Choose a PDF document",
+        type=["pdf"],
+        help="Only PDF files are supported.",
+        key="pdf_upload",
+    )
 
-if extract_clicked:
-    if uploaded_file is None:
-        st.warning("Please upload a PDF file first.")
-        st.stop()
-    if backend == "groq" and not (groq_key and groq_key.strip()):
-        st.error("Cannot run: Groq is selected but `GROQ_API_KEY` is not set in `.env`.")
-        st.stop()
+    extract_clicked = st.button("Extract Information", type="primary", key="extract_btn")
 
-    tmp_path: Path | None = None
-    try:
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
-            tmp.write(uploaded_file.getvalue())
-            tmp_path = Path(tmp.name)
+    if extract_clicked:
+        if uploaded_file is None:
+            st.warning("Please upload a PDF file first.")
+            return
+        if backend == "groq" and not (groq_key and groq_key.strip()):
+            st.error("Cannot run: Groq is selected but `GROQ_API_KEY` is not set in `.env`.")
+            return
 
         with st.spinner("Extracting structured information…"):
             try:
                 agent = _get_agent()
-                extracted = agent.extract_entity_from_pdf(tmp_path)
-                doc = fitz.open(tmp_path)
-                pdf_context = "\n".join(page.get_text() for page in doc).strip()
-                doc.close()
-                if not pdf_context:
-                    pdf_context = "(No text could be extracted from the PDF.)"
+                # Parse the upload in memory, once; the same text feeds extraction and Step 2 context
+                pdf_context = agent.extract_pdf_text(uploaded_file.getvalue())
+                extracted = agent.extract_entity_from_text(pdf_context)
             except ValueError as e:
                 st.error(str(e))
-                st.stop()
+                return
             except Exception as e:
                 st.error(f"Extraction failed: {e}")
                 st.exception(e)
-                st.stop()
-            finally:
-                if tmp_path and tmp_path.exists():
-                    try:
-                        tmp_path.unlink()
-                    except OSError:
-                        pass
-
-        st.session_state.extracted = extracted
+                return
+
+        # Strip once at write time; readers use the stored values as-is
+        st.session_state.extracted = {k: (v or "").strip() for k, v in extracted.items()}
         st.session_state.pdf_context = pdf_context
         st.success("Information extracted. You can load Subject or Employer into OSINT below.")
+        # Full-app rerun so Step 2 picks up the extracted fields and context
         st.rerun()
 
-    except Exception as e:
-        st.error(f"An error occurred: {e}")
-        raise
-
-# Show extracted fields when Step 1 is complete
-if st.session_state.extracted:
-    ex = st.session_state.extracted
-    st.markdown("#### Extracted information")
-    col1, col2 = st.columns(2)
-    with col1:
-        st.text_input("Subject", value=ex.get("subject_name", ""), disabled=True, key="disp_subject")
-        st.text_input("Employer", value=ex.get("employer", "") or "—", disabled=True, key="disp_employer")
-    with col2:
-        st.text_area("Income / source of funds", value=ex.get("income_description", "") or "—", disabled=True, height=120, key="disp_income")
-    st.text_area("Summary", value=ex.get("summary", "") or "—", disabled=True, height=120, key="disp_summary")
-    st.markdown("---")
+    # Show extracted fields when Step 1 is complete
+    if st.session_state.extracted:
+        ex = st.session_state.extracted
+        st.markdown("#### Extracted information")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.text_input("Subject", value=ex.get("subject_name", ""), disabled=True, key="disp_subject")
+            st.text_input("Employer", value=ex.get("employer", "") or "—", disabled=True, key="disp_employer")
+        with col2:
+            st.text_area("Income / source of funds", value=ex.get("income_description", "") or "—", disabled=True, height=120, key="disp_income")
+        st.text_area("Summary", value=ex.get("summary", "") or "—", disabled=True, height=120, key="disp_summary")
+        st.markdown("---")
 
 # ----- Step 2: Standalone OSINT (always visible) -----
-st.header("Adverse Media Screening")
-st.caption("GPT powered OSINT search. Run a search on any entity below.")
-
-# Load-from-extraction buttons (only when we have extracted data)
-if st.session_state.extracted:
-    ex = st.session_state.extracted
-    sub_name = (ex.get("subject_name") or "").strip()
-    emp_name = (ex.get("employer") or "").strip()
-    load_col1, load_col2, _ = st.columns([1, 1, 2])
-    with load_col1:
-        if st.button("Load Extracted Subject", key="load_subject"):
-            st.session_state.search_term = sub_name
-            st.session_state.osint_entity_input = sub_name
-            st.rerun()
-    with load_col2:
-        if st.button("Load Extracted Employer", key="load_employer", disabled=not emp_name):
-            st.session_state.search_term = emp_name
-            st.session_state.osint_entity_input = emp_name
-            st.rerun()
-
-# Editable search term; Load buttons set osint_entity_input
-st.text_input(
-    "Entity to search for Adverse Media:",
-    key="osint_entity_input",
-    placeholder="e.g. Person or company name",
-)
-
-run_osint_clicked = st.button("Run OSINT Search", type="primary", key="run_osint")
+def _load_entity(name: str) -> None:
+    """Load button callback: fill the search box with an (already stripped) extracted name."""
+    st.session_state.search_term = name
+    st.session_state.osint_entity_input = name
+    st.session_state.osint_entity_input_norm = name
+
+def _normalize_entity_input() -> None:
+    """Text input callback: store the stripped entity once per edit, not once per rerun."""
+    st.session_state.osint_entity_input_norm = (st.session_state.osint_entity_input or "").strip()
+
+@st.fragment
+def _osint_search() -> None:
+    """Step 2: pick an entity (loaded or typed), run Tavily search + streamed risk analysis."""
+    st.header("Adverse Media Screening")
+    st.caption("GPT powered OSINT search. Run a search on any entity below.")
+
+    # Load-from-extraction buttons (only when we have extracted data)
+    if st.session_state.extracted:
+        ex = st.session_state.extracted
+        sub_name = ex.get("subject_name", "")
+        emp_name = ex.get("employer", "")
+        load_col1, load_col2, _ = st.columns([1, 1, 2])
+        with load_col1:
+            st.button("Load Extracted Subject", key="load_subject", on_click=_load_entity, args=(sub_name,))
+        with load_col2:
+            st.button("Load Extracted Employer", key="load_employer", disabled=not emp_name, on_click=_load_entity, args=(emp_name,))
+
+    # Editable search term; Load buttons set osint_entity_input
+    st.text_input(
+        "Entity to search for Adverse Media:",
+        key="osint_entity_input",
+        placeholder="e.g. Person or company name",
+        on_change=_normalize_entity_input,
+    )
 
-if run_osint_clicked:
-    entity_to_search = (st.session_state.get("osint_entity_input") or "").strip()
-    if not entity_to_search:
-        st.warning("Enter an entity name to search for adverse media.")
-        st.stop()
-    if not tavily_key:
-        st.error("TAVILY_API_KEY is not set. Add it to .env to run OSINT.")
-        st.stop()
-    if backend == "groq" and not (groq_key and groq_key.strip()):
-        st.error("Groq is selected but GROQ_API_KEY is not set in .env.")
-        st.stop()
+    run_osint_clicked = st.button("Run OSINT Search", type="primary", key="run_osint")
 
-    try:
-        agent = _get_agent()
-    except ValueError as e:
-        st.error(str(e))
-        st.stop()
+    if run_osint_clicked:
+        entity_to_search = st.session_state.osint_entity_input_norm
+        if not entity_to_search:
+            st.warning("Enter an entity name to search for adverse media.")
+            return
+        if not tavily_key:
+            st.error("TAVILY_API_KEY is not set. Add it to .env to run OSINT.")
+            return
+        if backend == "groq" and not (groq_key and groq_key.strip()):
+            st.error("Groq is selected but GROQ_API_KEY is not set in .env.")
+            return
 
-    with st.status("Running OSINT and risk analysis…", expanded=True) as status:
-        st.write(f"**1. Searching adverse media for: {entity_to_search}**")
-        try:
-            search_data = agent.search_adverse_media(entity_to_search)
-            st.session_state.tavily_credits -= 1
-            st.write(f"✓ Found **{len(search_data['results'])}** result(s), **{len(search_data.get('images', []))}** image(s)")
-        except Exception as e:
-            status.update(label="Error", state="error")
-            st.exception(e)
-            st.stop()
-
-        st.write("**2. Generating risk report…**")
-        pdf_context = st.session_state.get("pdf_context") or "No document context (standalone OSINT search)."
         try:
-            report = agent.analyze_risk(
-                entity_name=entity_to_search,
-                pdf_context=pdf_context,
-                search_results=search_data["results"],
-            )
-            st.write("✓ Report generated")
-        except Exception as e:
-            status.update(label="Error", state="error")
-            st.exception(e)
-            st.stop()
-
-        status.update(label="Complete", state="complete")
-
-    st.session_state.last_report = report
-    st.session_state.last_search_data = search_data
-    st.rerun()
-
-# Display last report and images (when available)
-if st.session_state.last_report:
-    st.markdown("---")
-    st.subheader("📋 Report")
-    st.markdown(st.session_state.last_report)
-
-    search_data = st.session_state.last_search_data or {}
-    images = search_data.get("images") or []
-    if images:
-        with st.expander("📸 Related Media Thumbnails", expanded=True):
-            n = len(images)
-            cols = st.columns(n)
-            for i, img_url in enumerate(images):
-                with cols[i]:
-                    st.markdown(
-                        f'<a href="{img_url}" target="_blank"><img src="{img_url}" style="width:100%; border-radius:8px;"></a>',
-                        unsafe_allow_html=True,
-                    )
-                    display_url = f"{img_url[:40]}..." if len(img_url) > 40 else img_url
-                    st.caption(f"Source: [{display_url}]({img_url})")
+            agent = _get_agent()
+        except ValueError as e:
+            st.error(str(e))
+            return
+
+        with st.status("Running OSINT and risk analysis…", expanded=True) as status:
+            st.write(f"**1. Searching adverse media for: {entity_to_search}**")
+            try:
+                search_data = agent.search_adverse_media(entity_to_search)
+                # Cache hits do not reach Tavily, so they cost no credit
+                if not search_data.get("cached"):
+                    st.session_state.tavily_credits -= 1
+                cached_note = " (cached)" if search_data.get("cached") else ""
+                st.write(f"✓ Found **{len(search_data['results'])}** result(s), **{len(search_data.get('images', []))}** image(s){cached_note}")
+            except Exception as e:
+                status.update(label="Error", state="error")
+                st.exception(e)
+                return
+
+            st.write("**2. Generating risk report…**")
+            pdf_context = st.session_state.get("pdf_context") or "No document context (standalone OSINT search)."
+            try:
+                # Render tokens as they arrive; write_stream returns the full report text
+                report = st.write_stream(agent.analyze_risk_stream(
+                    entity_name=entity_to_search,
+                    pdf_context=pdf_context,
+                    search_results=search_data["results"],
+                ))
+                st.write("✓ Report generated")
+            except Exception as e:
+                status.update(label="Error", state="error")
+                st.exception(e)
+                return
+
+            status.update(label="Complete", state="complete")
+
+        st.session_state.last_report = report
+        st.session_state.last_search_data = search_data
+        # Full-app rerun so the report section and sidebar credits refresh
+        st.rerun()
+
+# ----- Report: last result and images (when available) -----
+def _render_report() -> None:
+    """Show the last Adverse Media Report and its media thumbnails."""
+    if st.session_state.last_report:
+        st.markdown("---")
+        st.subheader("📋 Report")
+        st.markdown(st.session_state.last_report)
+
+        search_data = st.session_state.last_search_data or {}
+        images = search_data.get("images") or []
+        if images:
+            with st.expander("📸 Related Media Thumbnails", expanded=True):
+                n = len(images)
+                cols = st.columns(n)
+                for i, img_url in enumerate(images):
+                    with cols[i]:
+                        st.markdown(
+                            f'<a href="{img_url}" target="_blank"><img src="{img_url}" loading="lazy" decoding="async" fetchpriority="low" style="width:100%; border-radius:8px;"></a>',
+                            unsafe_allow_html=True,
+                        )
+                        display_url = f"{img_url[:40]}..." if len(img_url) > 40 else img_url
+                        st.caption(f"Source: [{display_url}]({img_url})")
+
+
+_document_extraction()
+_osint_search()
+_render_report()
@@ -5,25 +5,94 @@ Local document extraction and automated OSINT Adverse Media screening.
 Supports dual LLM backends: Ollama (local/on-prem) and Groq (fast public demos).
 """
 
+import hashlib
+import io
 import json
 import logging
 import os
 import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator, Literal
 from urllib.request import Request, urlopen
 from urllib.error import HTTPError, URLError
 
 import fitz
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain_core.prompts import PromptTemplate
 from langchain_community.llms import Ollama
+from langchain_core.output_parsers import PydanticOutputParser
 from langchain_groq import ChatGroq
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+from pydantic.json_schema import SkipJsonSchema
 from tavily import TavilyClient
 
+# Optional: orjson parses/serializes bytes directly in C; stdlib json is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# Upper bound on document text kept per PDF. The LLM context is bounded anyway,
+# so pages past this budget are never read.
+MAX_CONTEXT_CHARS = 60_000
+
+# How long a successful Tavily usage lookup is reused before re-fetching
+TAVILY_USAGE_TTL_SECONDS = 30
+
+# Default local model. Untagged "llama3.2" is the 3B Q4_K_M build; pass
+# "llama3.2:3b-instruct-q4_K_M" as model_name to pin those weights by tag
+DEFAULT_OLLAMA_MODEL = "llama3.2"
+
+# How long Ollama keeps the model loaded after a request (Ollama's default is 5m)
+OLLAMA_KEEP_ALIVE = "1h"
+
+# Plain-text extraction flags: keep whitespace and clip to the page, but drop the
+# defaults the LLM has no use for (ligature preservation, CID glyph codes for
+# unmapped characters). Ligatures are expanded to plain letters instead.
+_TEXT_FLAGS = fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP
+
+# Extraction prompt input budget: the first window of document text is sent, and
+# the next one only if no subject was found (bounds prefill tokens per call).
+EXTRACTION_MAX_CHARS = 8_000
+EXTRACTION_MAX_WINDOWS = 2
+
+# Adverse media keywords appended to every Tavily query (one place to tune/A-B test)
+_ADVERSE_TERMS = " fraud OR money laundering OR scam OR indictment OR SEC OR illegal"
+
+# Speculative search seed: a "Name: ..." style label within the first chars of text
+SEED_SCAN_CHARS = 1_000
+# The value is single-space-separated words without colons, ending the line or
+# followed by a column gap (2+ spaces or a tab); a line like "Name: Jane Doe
+# Account No: 123" gives no seed rather than a polluted one.
+_LABEL_VALUE = r"[ \t]*[:\-][ \t]*([^\s:]+(?: [^\s:]+)*)(?=[ \t]{2,}|\t|[ \t]*$)"
+# Tried in order: explicit subject labels beat generic ones, so a "Client: Retail
+# Banking" header above "Full name: Jane Doe" still seeds "Jane Doe".
+_NAME_LABELS = (
+    re.compile(r"^[ \t]*(?:full|subject)[ \t]+name" + _LABEL_VALUE, re.IGNORECASE | re.MULTILINE),
+    re.compile(
+        r"^[ \t]*(?:(?:customer|client|account[ \t]+holder)(?:[ \t]+name)?|name)" + _LABEL_VALUE,
+        re.IGNORECASE | re.MULTILINE,
+    ),
+)
+
+# On-disk OSINT cache: one JSON file per normalized entity name, so repeat
+# screenings of the same entity within the TTL cost no Tavily credit.
+OSINT_CACHE_DIR = Path(".osint_cache")
+OSINT_CACHE_TTL_SECONDS = 24 * 60 * 60
+# In-process LRU in front of the disk cache, shared by all agents in the process
+# (results do not depend on the LLM backend): repeat lookups skip file I/O.
+OSINT_MEMORY_CACHE_SIZE = 1024
+# Disk entries kept after each write: expired files are deleted, then the oldest
+# beyond this count, so screened-person data does not outlive the TTL on disk
+OSINT_DISK_CACHE_MAX_ENTRIES = OSINT_MEMORY_CACHE_SIZE
+_search_memo: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+_search_memo_lock = threading.Lock()
+_NON_WORD = re.compile(r"\W+")
+
 
 def _llm_response_text(response: Any) -> str:
     """Extract plain text from LLM response (Ollama returns str, ChatGroq returns AIMessage)."""
@@ -32,6 +101,136 @@ def _llm_response_text(response: Any) -> str:
     return (response or "").strip()
 
 
+def _json_loads(data: bytes | str) -> Any:
+    """Parse JSON with orjson when available (raises ValueError on invalid JSON or UTF-8 either way)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes with orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+def _warm_up_ollama(base_url: str, model_names: list[str], keep_alive: str | int) -> None:
+    """
+    Load each of model_names into Ollama's memory ahead of the first real request.
+
+    A generate call without a prompt only loads the model. A missing model
+    (HTTP 404, e.g. the tag was never pulled) is logged as a warning, since
+    every real call will fail too; other failures are logged and ignored and
+    the first real call simply pays the cold load.
+    """
+    for model_name in model_names:
+        payload = json.dumps({"model": model_name, "keep_alive": keep_alive}).encode()
+        req = Request(
+            f"{base_url.rstrip('/')}/api/generate",
+            data=payload,
+            headers={"Content-Type": "application/json"},
+        )
+        start = time.monotonic()
+        try:
+            with urlopen(req, timeout=300) as resp:
+                resp.read()
+            logger.info("Ollama model %s warmed up in %.1fs", model_name, time.monotonic() - start)
+        except HTTPError as e:
+            if e.code == 404:
+                logger.warning(
+                    "Ollama model %s not found; run `ollama pull %s`",
+                    model_name,
+                    model_name,
+                )
+            else:
+                logger.debug("Ollama warm-up for %s failed: %s", model_name, e)
+        except (URLError, OSError) as e:
+            logger.debug("Ollama warm-up for %s failed: %s", model_name, e)
+
+
+def normalize_entity_name(name: str) -> str:
+    """
+    Canonical form of an entity name for cache keys and comparisons:
+    punctuation and whitespace runs collapsed to one space, lowercased
+    (so "ACME, Inc." and "acme inc" share a key).
+    """
+    return _NON_WORD.sub(" ", name or "").strip().lower()
+
+
+def entity_name_matches(name: str, other: str) -> bool:
+    """
+    True if both names are non-empty and equal after normalization (so "ACME,
+    Inc." matches "acme inc", but "Jane Doe" does not match "Jane Doe Account").
+    """
+    normalized = normalize_entity_name(name)
+    return bool(normalized) and normalized == normalize_entity_name(other)
+
+
+def _memo_get(cache_key: str) -> dict[str, Any] | None:
+    """In-process LRU lookup; returns the payload if present and within TTL."""
+    with _search_memo_lock:
+        entry = _search_memo.get(cache_key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > OSINT_CACHE_TTL_SECONDS:
+            del _search_memo[cache_key]
+            return None
+        _search_memo.move_to_end(cache_key)
+        return entry[1]
+
+
+def _memo_put(cache_key: str, data: dict[str, Any], stored_at: float | None = None) -> None:
+    """Insert into the in-process LRU, evicting the least recently used entry when full."""
+    with _search_memo_lock:
+        _search_memo[cache_key] = (time.time() if stored_at is None else stored_at, data)
+        _search_memo.move_to_end(cache_key)
+        while len(_search_memo) > OSINT_MEMORY_CACHE_SIZE:
+            _search_memo.popitem(last=False)
+
+
+def guess_search_seed(document_text: str) -> str | None:
+    """
+    Cheap guess at the subject's name from an explicit label near the top of
+    the document (e.g. "Full name: Jane Doe"), without an LLM call.
+
+    Used to start a speculative adverse media search while extraction runs.
+    Returns None when no label is found, so no search credit is spent on a
+    blind guess.
+    """
+    head = document_text[:SEED_SCAN_CHARS]
+    for pattern in _NAME_LABELS:
+        match = pattern.search(head)
+        if match:
+            return match.group(1).strip()[:100] or None
+    return None
+
+
+def clear_osint_cache(cache_dir: str | Path = OSINT_CACHE_DIR) -> int:
+    """
+    Delete all cached OSINT search results: the in-process LRU and the files
+    in cache_dir. Returns the number of on-disk entries removed.
+    """
+    with _search_memo_lock:
+        _search_memo.clear()
+    removed = 0
+    for path in Path(cache_dir).glob("*.json"):
+        try:
+            path.unlink()
+            removed += 1
+        except OSError as e:
+            logger.debug("Could not remove OSINT cache entry %s: %s", path, e)
+    logger.info("Cleared %d OSINT cache entries from %s", removed, cache_dir)
+    return removed
+
+
+def _llm_chunk_text(chunk: Any) -> str:
+    """Extract text from a streamed chunk (Ollama yields str, ChatGroq yields AIMessageChunk). Not stripped."""
+    if hasattr(chunk, "content"):
+        return chunk.content or ""
+    return chunk or ""
+
+
 class ExtractedEntity(BaseModel):
     """Structured KYC/EDD entity extraction from a document."""
 
@@ -41,6 +240,167 @@ class ExtractedEntity(BaseModel):
     summary: str = Field(description="A concise 2-sentence summary of the actual facts and data presented in the document. DO NOT output instructions.")
 
 
+class Finding(BaseModel):
+    """One adverse media finding, tied to a search result URL."""
+
+    description: str = Field(description="What the source reports about the subject, in one or two sentences")
+    source_url: str = Field(description="The EXACT URL of the search result this finding comes from")
+    true_positive: bool = Field(description="True if the source refers to the same person or company as the document; false if it is likely a different entity")
+
+
+class KYCReport(BaseModel):
+    """Combined extraction + adverse media assessment from a single LLM call."""
+
+    entity: ExtractedEntity
+    executive_summary: str = Field(description="Brief overview of the subject and whether any adverse findings appear to relate to them")
+    findings: list[Finding] = Field(description="One entry per relevant search result; empty if there are none")
+    risk_level: Literal["High", "Medium", "Low"] = Field(description="Overall adverse media risk, based on true positive findings and their severity")
+    risk_rationale: str = Field(description="Short justification for risk_level")
+    sources: list[str] = Field(description="Every search result URL used in the findings, copied exactly")
+    # Set locally by screen_document, not by the LLM (kept out of the JSON schema)
+    dropped_findings: SkipJsonSchema[int] = 0
+
+    @field_validator("risk_level", mode="before")
+    @classmethod
+    def _capitalize_risk_level(cls, value: Any) -> Any:
+        """Accept "high" / "HIGH" etc. from the model."""
+        return value.strip().capitalize() if isinstance(value, str) else value
+
+    @property
+    def unverified(self) -> bool:
+        """True if the risk is rated above Low without a sourced true-positive finding."""
+        return self.risk_level != "Low" and not any(f.true_positive for f in self.findings)
+
+
+# Prompts are plain str.format templates (no PromptTemplate/Runnable layer). The
+# JSON format instructions are LangChain's standard text (including its
+# "not well-formatted" example, which keeps small models from echoing the schema
+# back), rendered once at import.
+_FORMAT_INSTRUCTIONS = PydanticOutputParser(pydantic_object=ExtractedEntity).get_format_instructions()
+_REPORT_FORMAT_INSTRUCTIONS = PydanticOutputParser(pydantic_object=KYCReport).get_format_instructions()
+
+# Both prompts open with the same document block. The extraction call and the
+# later risk call on the same document then share a token prefix, which Ollama
+# (llama.cpp prompt cache) reuses instead of re-prefilling the whole PDF text.
+# Keep it byte-identical, and keep task-specific wording after it.
+_DOCUMENT_PREFIX = """Document text (KYC / EDD document, from PDF):
+---
+{document_text}
+---
+
+"""
+
+_EXTRACTION_PROMPT = (
+    _DOCUMENT_PREFIX
+    + """You are a KYC (Know Your Customer) analyst. Extract the following information from the document above as a single JSON object.
+
+{format_instructions}
+
+Output ONLY valid JSON with the four keys. No markdown, no code fences, no explanation."""
+)
+
+_RISK_PROMPT = (
+    _DOCUMENT_PREFIX
+    + """You are a Senior AML (Anti-Money Laundering) Investigator. Your task is to compare the subject's KYC document above with open-source adverse media search results and produce a structured Adverse Media Report.
+
+CRITICAL ANTI-HALLUCINATION RULE: You must ONLY cite and use the EXACT URLs provided in the search_results. If the search results are empty, irrelevant, or contain garbage links, state clearly that no valid adverse media was found and assess the risk as Low. DO NOT make up, guess, or invent URLs.
+
+Subject under review: {entity_name}
+
+---
+Adverse media search results (OSINT):
+---
+{search_results}
+---
+
+Write a structured Adverse Media Report containing the following sections. Use clear headings and bullet points where appropriate.
+
+1. Executive Summary
+   - Brief overview of the subject and whether any adverse findings appear to relate to them.
+
+2. True Positive / False Positive Assessment
+   - Does the news or content in the search results actually refer to the same person or company described in the PDF? Or are these likely different individuals/entities (false positives)? Explain your reasoning.
+
+3. Key Findings (with sources)
+   - List each relevant finding with the source URL. If none are true positives, state that clearly.
+
+4. Risk Level
+   - Conclude with one of: High, Medium, or Low. Justify based on the true positive findings and their severity.
+
+5. Sources & References
+   - List every source URL used in your findings (from the search results provided). One URL per line for human review.
+
+Output the full report only. No meta-commentary before or after."""
+)
+
+# Single-pass variant: extraction and risk assessment in one call, so the
+# document is prefilled once. The markdown report is rendered locally from the
+# JSON (render_kyc_report), not generated by the LLM.
+_SCREENING_PROMPT = (
+    _DOCUMENT_PREFIX
+    + """You are a KYC analyst and Senior AML (Anti-Money Laundering) Investigator. Extract the subject's KYC fields from the document above, then compare the subject with the open-source adverse media search results below (searched for: {search_subject}).
+
+For each relevant search result, decide whether it refers to the same person or company as the document (true positive) or a different entity (false positive). Assess the overall risk as High, Medium, or Low.
+
+CRITICAL ANTI-HALLUCINATION RULE: You must ONLY cite the EXACT URLs provided in the search results. If the search results are empty, irrelevant, or contain garbage links, return no findings and assess the risk as Low. DO NOT make up, guess, or invent URLs.
+
+---
+Adverse media search results (OSINT):
+---
+{search_results}
+---
+
+{format_instructions}
+
+Output ONLY valid JSON. No markdown, no code fences, no explanation."""
+)
+
+
+def render_kyc_report(report: KYCReport) -> str:
+    """Render a KYCReport as the markdown Adverse Media Report (same sections as analyze_risk)."""
+    entity = report.entity
+    if report.findings:
+        findings = "\n".join([
+            f"- {'**True positive**' if f.true_positive else 'False positive'}: {f.description} ({f.source_url})"
+            for f in report.findings
+        ])
+    else:
+        findings = "- No adverse media findings."
+    true_positives = sum(f.true_positive for f in report.findings)
+    dropped = (
+        f" {report.dropped_findings} finding(s) citing URLs outside the search results were discarded."
+        if report.dropped_findings else ""
+    )
+    risk = f"{report.risk_level} (unverified: no sourced true-positive finding)" if report.unverified else report.risk_level
+    sources = "\n".join([f"- {u}" for u in report.sources]) or "- None."
+    return f"""## Adverse Media Report: {entity.subject_name or "Unknown subject"}
+
+- **Employer:** {entity.employer or "—"}
+- **Income / source of funds:** {entity.income_description or "—"}
+- **Document summary:** {entity.summary or "—"}
+
+### 1. Executive Summary
+
+{report.executive_summary}
+
+### 2. True Positive / False Positive Assessment
+
+{true_positives} of {len(report.findings)} finding(s) assessed as referring to the subject.{dropped}
+
+### 3. Key Findings (with sources)
+
+{findings}
+
+### 4. Risk Level
+
+**{risk}**: {report.risk_rationale}
+
+### 5. Sources & References
+
+{sources}
+"""
+
+
 class AdverseMediaAgent:
     """
     Agent for adverse media screening: PDF entity extraction, OSINT search,
@@ -51,8 +411,12 @@ class AdverseMediaAgent:
         self,
         backend: str = "ollama",
         groq_api_key: str | None = None,
-        model_name: str = "llama3.2",
+        model_name: str = DEFAULT_OLLAMA_MODEL,
         base_url: str = "http://localhost:11434",
+        accuracy_model_name: str | None = None,
+        keep_alive: str | int = OLLAMA_KEEP_ALIVE,
+        osint_cache_dir: str | Path | None = OSINT_CACHE_DIR,
+        warm_up: bool = True,
         **ollama_kwargs: Any,
     ) -> None:
         """
@@ -62,9 +426,25 @@ class AdverseMediaAgent:
             backend: "ollama" for local inference, "groq" for Groq API.
             groq_api_key: API key for Groq (required if backend=="groq");
                 can also be set via GROQ_API_KEY env var.
-            model_name: Ollama model (e.g. 'llama3.2'); used only when backend=="ollama".
+            model_name: Ollama model tag; used only when backend=="ollama". Defaults
+                to "llama3.2" (the 3B Q4_K_M build); use
+                'llama3.2:3b-instruct-q4_K_M' to pin it by tag.
             base_url: Ollama API base URL; used only when backend=="ollama".
-            **ollama_kwargs: Optional kwargs for Ollama (e.g. temperature).
+            accuracy_model_name: Optional higher-precision Ollama tag (e.g.
+                'llama3.2:3b-instruct-q8_0') used only for entity extraction,
+                where exact figures matter; the risk report keeps model_name.
+            keep_alive: How long Ollama keeps the model(s) loaded after a request
+                (e.g. "1h", or -1 for indefinitely); used only when backend=="ollama".
+                Server-wide batching is configured on `ollama serve` itself
+                (OLLAMA_NUM_PARALLEL, OLLAMA_MAX_LOADED_MODELS); see the README.
+            osint_cache_dir: Directory for cached Tavily results (TTL
+                OSINT_CACHE_TTL_SECONDS); None disables the on-disk layer
+                (the in-process LRU still applies).
+            warm_up: If True (ollama only), load the model into memory in a
+                background thread so the first extraction skips the cold load.
+            **ollama_kwargs: Optional kwargs for Ollama (e.g. temperature, or
+                num_ctx / num_thread / num_gpu to tune context size and
+                hardware use).
         """
         # Tavily OSINT client (required for search_adverse_media)
         tavily_key = os.environ.get("TAVILY_API_KEY")
@@ -73,20 +453,55 @@ class AdverseMediaAgent:
                 "TAVILY_API_KEY is required. Set it in your environment or .env file."
             )
         self.tavily_client = TavilyClient(api_key=tavily_key.strip())
+        self.osint_cache_dir = Path(osint_cache_dir) if osint_cache_dir else None
+        # (monotonic timestamp, last successful get_tavily_usage result)
+        self._usage_cache: tuple[float, dict[str, Any]] | None = None
 
         self.backend = backend
         if backend == "ollama":
             self.model_name = model_name
+            # Keep the model resident between the extraction and risk calls
+            ollama_kwargs["keep_alive"] = keep_alive
             self.llm = Ollama(
                 model=model_name,
                 base_url=base_url,
                 **ollama_kwargs,
             )
+            # Extraction client: Ollama constrains decoding to valid JSON
+            self.extraction_model_name = accuracy_model_name or model_name
+            self.json_llm = Ollama(
+                model=self.extraction_model_name,
+                base_url=base_url,
+                format="json",
+                **ollama_kwargs,
+            )
+            # Single-pass screening produces the risk report, so it stays on model_name
+            if self.extraction_model_name == model_name:
+                self.report_json_llm = self.json_llm
+            else:
+                self.report_json_llm = Ollama(
+                    model=model_name,
+                    base_url=base_url,
+                    format="json",
+                    **ollama_kwargs,
+                )
             logger.info(
                 "AdverseMediaAgent initialized with backend=ollama, model=%s, base_url=%s",
                 model_name,
                 base_url,
             )
+            if warm_up:
+                threading.Thread(
+                    target=_warm_up_ollama,
+                    # Extraction model first: it serves the first request
+                    args=(
+                        base_url,
+                        list(dict.fromkeys([self.extraction_model_name, model_name])),
+                        keep_alive,
+                    ),
+                    name="ollama-warm-up",
+                    daemon=True,
+                ).start()
         elif backend == "groq":
             api_key = groq_api_key or os.environ.get("GROQ_API_KEY")
             if not api_key:
@@ -98,6 +513,9 @@ class AdverseMediaAgent:
                 model=self.model_name,
                 api_key=api_key,
             )
+            # Extraction client: Groq JSON mode guarantees a JSON object response
+            self.json_llm = self.llm.bind(response_format={"type": "json_object"})
+            self.report_json_llm = self.json_llm
             logger.info(
                 "AdverseMediaAgent initialized with backend=groq, model=%s",
                 self.model_name,
@@ -107,89 +525,166 @@ class AdverseMediaAgent:
                 f'backend must be "ollama" or "groq", got: {backend!r}'
             )
 
-    def extract_entity_from_pdf(self, pdf_path: str | Path) -> dict[str, str]:
+    def extract_pdf_text(self, pdf_source: str | Path | bytes) -> str:
         """
-        Read the PDF and extract structured KYC/EDD fields via the LLM.
-
-        Uses PyMuPDF for text extraction and the LLM as a KYC analyst to
-        extract subject_name, employer, income_description, and summary.
-        Output is enforced as JSON and validated with Pydantic.
+        Read the PDF and return its full text (PyMuPDF, pages joined by newlines).
 
         Args:
-            pdf_path: Path to the PDF file.
+            pdf_source: Path to the PDF file, or the raw PDF bytes (e.g. an
+                in-memory upload), which are opened as a stream without
+                touching disk.
 
         Returns:
-            Dict with keys: subject_name, employer, income_description, summary.
+            The extracted document text, stripped and capped at
+            MAX_CONTEXT_CHARS characters.
 
         Raises:
-            FileNotFoundError: If the PDF path does not exist.
-            ValueError: If the PDF cannot be read or JSON extraction fails.
+            FileNotFoundError: If a PDF path is given and does not exist.
+            ValueError: If the PDF cannot be read or contains no text.
         """
-        path = Path(pdf_path)
-        if not path.exists():
-            raise FileNotFoundError(f"PDF not found: {pdf_path}")
+        if isinstance(pdf_source, bytes):
+            label = "<in-memory PDF>"
+        else:
+            label = str(pdf_source)
+            if not Path(pdf_source).exists():
+                raise FileNotFoundError(f"PDF not found: {pdf_source}")
 
         try:
-            doc = fitz.open(path)
-            text_chunks = [page.get_text() for page in doc]
-            doc.close()
+            if isinstance(pdf_source, bytes):
+                doc = fitz.open(stream=pdf_source, filetype="pdf")
+            else:
+                doc = fitz.open(Path(pdf_source))
+            buf = io.StringIO()
+            with doc:
+                for i, page in enumerate(doc):
+                    if i:
+                        buf.write("\n")
+                    buf.write(page.get_text("text", flags=_TEXT_FLAGS, sort=False))
+                    if buf.tell() >= MAX_CONTEXT_CHARS:
+                        logger.info(
+                            "PDF text reached %d chars after page %d of %d; skipping the rest",
+                            MAX_CONTEXT_CHARS,
+                            i + 1,
+                            doc.page_count,
+                        )
+                        break
         except Exception as e:
-            logger.exception("Failed to read PDF: %s", pdf_path)
+            logger.exception("Failed to read PDF: %s", label)
             raise ValueError(f"Could not read PDF: {e}") from e
 
-        full_text = "\n".join(text_chunks).strip()
+        full_text = buf.getvalue()[:MAX_CONTEXT_CHARS].strip()
         if not full_text:
-            raise ValueError(f"No text extracted from PDF: {pdf_path}")
+            raise ValueError(f"No text extracted from PDF: {label}")
+        return full_text
 
-        parser = PydanticOutputParser(pydantic_object=ExtractedEntity)
-        format_instructions = parser.get_format_instructions()
+    def extract_entity_from_pdf(self, pdf_path: str | Path | bytes) -> dict[str, str]:
+        """
+        Read the PDF and extract structured KYC/EDD fields via the LLM.
 
-        prompt = PromptTemplate.from_template(
-            """You are a KYC (Know Your Customer) analyst. Extract the following information from the document as a single JSON object.
+        Convenience wrapper around extract_pdf_text + extract_entity_from_text.
+        Callers that also need the raw text (e.g. as risk-analysis context)
+        should call those two directly so the PDF is parsed only once.
 
-Document text:
----
-{document_text}
----
+        Args:
+            pdf_path: Path to the PDF file, or the raw PDF bytes.
 
-{format_instructions}
+        Returns:
+            Dict with keys: subject_name, employer, income_description, summary.
 
-Output ONLY valid JSON with the four keys. No markdown, no code fences, no explanation."""
-        )
-        chain = prompt | self.llm
-        response = chain.invoke({
-            "document_text": full_text,
-            "format_instructions": format_instructions,
-        })
+        Raises:
+            FileNotFoundError: If a PDF path is given and does not exist.
+            ValueError: If the PDF cannot be read or JSON extraction fails.
+        """
+        return self.extract_entity_from_text(self.extract_pdf_text(pdf_path))
+
+    def extract_entity_from_text(self, full_text: str) -> dict[str, str]:
+        """
+        Extract structured KYC/EDD fields from document text via the LLM.
+
+        Uses the LLM as a KYC analyst to extract subject_name, employer,
+        income_description, and summary. Output is constrained to JSON by the
+        backend's native JSON mode (Ollama format="json", Groq json_object)
+        and validated with Pydantic.
+
+        Only the first EXTRACTION_MAX_CHARS characters are sent (KYC fields
+        almost always sit on the first page or two); if no subject is found
+        there, the next window is tried, up to EXTRACTION_MAX_WINDOWS calls.
+        Windows are merged field by field, keeping the first non-empty value,
+        so e.g. an employer found in the first window is not lost.
+
+        Args:
+            full_text: Document text (e.g. from extract_pdf_text).
+
+        Returns:
+            Dict with keys: subject_name, employer, income_description, summary.
+
+        Raises:
+            ValueError: If JSON extraction fails.
+        """
+        starts = range(0, max(len(full_text), 1), EXTRACTION_MAX_CHARS)[:EXTRACTION_MAX_WINDOWS]
+        out: dict[str, str] = {}
+        for n, start in enumerate(starts):
+            window = full_text[start:start + EXTRACTION_MAX_CHARS]
+            for key, value in self._extract_entity_window(window).items():
+                if not (out.get(key) or "").strip():
+                    out[key] = value
+            if out.get("subject_name", "").strip() or n == len(starts) - 1:
+                break
+            logger.info(
+                "No subject found in document chars %d-%d; retrying with the next window",
+                start,
+                start + len(window),
+            )
+        logger.info("Extracted entity from PDF: subject_name=%s", out.get("subject_name"))
+        return out
+
+    def _extract_entity_window(self, document_text: str) -> dict[str, str]:
+        """Run one JSON-mode extraction call over document_text and validate it."""
+        response = self.json_llm.invoke(_EXTRACTION_PROMPT.format(
+            document_text=document_text,
+            format_instructions=_FORMAT_INSTRUCTIONS,
+        ))
         raw = _llm_response_text(response)
-        # Strip optional markdown code block
-        raw = re.sub(r"^```(?:json)?\s*", "", raw)
-        raw = re.sub(r"\s*```\s*$", "", raw).strip()
         try:
-            entity = parser.parse(raw)
+            entity = ExtractedEntity.model_validate_json(raw)
         except Exception as e:
             logger.exception("LLM output did not parse as ExtractedEntity: %s", raw[:200])
             raise ValueError(f"Extraction failed: {e}") from e
-        out = entity.model_dump()
-        logger.info("Extracted entity from PDF: subject_name=%s", out.get("subject_name"))
-        return out
+        return entity.model_dump()
 
-    def search_adverse_media(self, target_entity: str) -> dict[str, Any]:
+    def search_adverse_media(self, target_entity: str, use_cache: bool = True) -> dict[str, Any]:
         """
         Perform Tavily advanced search for adverse media mentions of the target.
 
+        Successful searches are cached by normalized entity name for
+        OSINT_CACHE_TTL_SECONDS, in an in-process LRU backed by the on-disk
+        cache; failed searches are never cached.
+
         Args:
             target_entity: The entity to search for (e.g. subject name or employer).
+            use_cache: If False, skip the cache lookup and always query Tavily
+                (the fresh result still refreshes the cache).
 
         Returns:
-            Dict with "results" (list of text-result dicts with title, url, content,
-            href, body) and "images" (list of up to 3 image URLs). On failure,
-            returns {"results": [], "images": []}.
+            Dict with "results" (list of text-result dicts with title, url and
+            content), "images" (list of up to 3 image URLs) and "cached"
+            (True if served from the cache, i.e. no Tavily credit was used).
+            On failure, returns {"results": [], "images": [], "cached": False}.
         """
-        query = (
-            f"{target_entity} fraud OR money laundering OR scam OR indictment OR SEC OR illegal"
-        )
-        empty = {"results": [], "images": []}
+        cache_key = normalize_entity_name(target_entity)
+        if use_cache and cache_key:
+            cached = _memo_get(cache_key)
+            if cached is None:
+                entry = self._read_cached_search(cache_key)
+                if entry is not None:
+                    _memo_put(cache_key, entry[1], stored_at=entry[0])
+                    cached = entry[1]
+            if cached is not None:
+                logger.info("Adverse media search for '%s' served from cache", target_entity)
+                return {**cached, "cached": True}
+
+        query = target_entity + _ADVERSE_TERMS
+        empty = {"results": [], "images": [], "cached": False}
         try:
             response = self.tavily_client.search(
                 query=query,
@@ -198,19 +693,10 @@ Output ONLY valid JSON with the four keys. No markdown, no code fences, no expla
                 include_raw_content=False,
                 include_images=True,
             )
-            raw_list = response.get("results") or []
-            results = []
-            for r in raw_list:
-                title = r.get("title", "")
-                url = r.get("url", "")
-                content = r.get("content", "")
-                results.append({
-                    "title": title,
-                    "url": url,
-                    "content": content,
-                    "href": url,
-                    "body": content,
-                })
+            results = [
+                {"title": r.get("title", ""), "url": r.get("url", ""), "content": r.get("content", "")}
+                for r in response.get("results") or []
+            ]
             raw_images = response.get("images") or []
             image_urls = []
             for img in raw_images[:3]:
@@ -224,19 +710,102 @@ Output ONLY valid JSON with the four keys. No markdown, no code fences, no expla
                 len(results),
                 len(image_urls),
             )
-            return {"results": results, "images": image_urls}
+            data = {"results": results, "images": image_urls}
+            if cache_key:
+                _memo_put(cache_key, data)
+            self._write_cached_search(cache_key, data)
+            return {**data, "cached": False}
         except Exception as e:
             logger.warning("Tavily adverse media search failed for '%s': %s", target_entity, e)
             return empty
 
+    def _cache_path(self, cache_key: str) -> Path:
+        """Cache file for a normalized entity name (hashed, so no names appear on disk)."""
+        digest = hashlib.sha256(cache_key.encode("utf-8")).hexdigest()
+        return self.osint_cache_dir / f"{digest}.json"
+
+    def _read_cached_search(self, cache_key: str) -> tuple[float, dict[str, Any]] | None:
+        """Return (stored_at, payload) for an on-disk entry within TTL, else None."""
+        if self.osint_cache_dir is None or not cache_key:
+            return None
+        path = self._cache_path(cache_key)
+        try:
+            stored_at = path.stat().st_mtime
+            if time.time() - stored_at > OSINT_CACHE_TTL_SECONDS:
+                path.unlink(missing_ok=True)
+                return None
+            data = _json_loads(path.read_bytes())
+        except (OSError, ValueError):
+            # Unreadable, truncated or non-UTF-8 entry: treat as a cache miss
+            return None
+        if not isinstance(data, dict) or "results" not in data:
+            return None
+        return stored_at, {"results": data.get("results") or [], "images": data.get("images") or []}
+
+    def _write_cached_search(self, cache_key: str, data: dict[str, Any]) -> None:
+        """
+        Persist a successful search payload; cache write failures are logged, not raised.
+
+        Writes to a temp file in the cache directory and os.replace()s it into
+        place, so concurrent Streamlit sessions never read a half-written entry
+        (the last writer for an entity wins). Expired and excess entries are
+        pruned afterwards (see _prune_cache_dir).
+        """
+        if self.osint_cache_dir is None or not cache_key:
+            return
+        tmp_path: str | None = None
+        try:
+            self.osint_cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.osint_cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(_json_dumps(data))
+            os.replace(tmp_path, self._cache_path(cache_key))
+            tmp_path = None
+        except OSError as e:
+            logger.debug("OSINT cache write failed: %s", e)
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+        self._prune_cache_dir()
+
+    def _prune_cache_dir(self) -> None:
+        """Delete expired cache files, then the oldest beyond OSINT_DISK_CACHE_MAX_ENTRIES."""
+        now = time.time()
+        live: list[tuple[float, Path]] = []
+        for path in self.osint_cache_dir.glob("*.json"):
+            try:
+                stored_at = path.stat().st_mtime
+                if now - stored_at > OSINT_CACHE_TTL_SECONDS:
+                    path.unlink()
+                else:
+                    live.append((stored_at, path))
+            except OSError:
+                # Removed concurrently by another session, or not removable
+                continue
+        live.sort()
+        for _, path in live[:max(len(live) - OSINT_DISK_CACHE_MAX_ENTRIES, 0)]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
     def get_tavily_usage(self) -> dict[str, Any]:
         """
         Fetch current Tavily API usage/credits (key-level).
 
+        Successful responses are cached for TAVILY_USAGE_TTL_SECONDS, so
+        frequent polling does not pay an HTTPS round trip (and TLS handshake)
+        each time; failures are not cached.
+
         Returns:
             Dict with 'usage', 'limit', 'status', etc. If the request fails,
             returns {"status": "unknown"}.
         """
+        if self._usage_cache and time.monotonic() - self._usage_cache[0] < TAVILY_USAGE_TTL_SECONDS:
+            return dict(self._usage_cache[1])
         api_key = os.environ.get("TAVILY_API_KEY") or ""
         if not api_key.strip():
             return {"status": "unknown"}
@@ -246,15 +815,17 @@ Output ONLY valid JSON with the four keys. No markdown, no code fences, no expla
                 headers={"Authorization": f"Bearer {api_key.strip()}"},
             )
             with urlopen(req, timeout=10) as resp:
-                data = json.loads(resp.read().decode())
+                data = _json_loads(resp.read())
             key_info = data.get("key") or data
-            return {
+            result = {
                 "status": "ok",
                 "usage": key_info.get("usage"),
                 "limit": key_info.get("limit"),
                 "search_usage": key_info.get("search_usage"),
             }
-        except (HTTPError, URLError, json.JSONDecodeError, OSError) as e:
+            self._usage_cache = (time.monotonic(), result)
+            return dict(result)
+        except (HTTPError, URLError, ValueError, OSError) as e:
             logger.debug("Tavily usage fetch failed: %s", e)
             return {"status": "unknown"}
 
@@ -272,69 +843,138 @@ Output ONLY valid JSON with the four keys. No markdown, no code fences, no expla
             entity_name: Name of the screened entity.
             pdf_context: Relevant text or metadata extracted from the PDF.
             search_results: List of text-result dicts (e.g. search_data["results"])
-                with 'title', 'href', and 'body'. The Langchain prompt formats these.
+                with 'title', 'url', and 'content'. These are rendered into the risk prompt.
 
         Returns:
             Full Adverse Media Report string (Executive Summary, True/False
             Positive assessment, Key Findings with sources, Risk Level).
         """
-        search_blob = "\n\n".join(
-            f"Title: {r.get('title', '')}\nURL: {r.get('href', '')}\nSummary: {r.get('body', '')}"
-            for r in (search_results or [])
-        )
-        if not search_blob.strip():
-            search_blob = "(No adverse media search results available.)"
-
-        prompt = PromptTemplate.from_template(
-            """You are a Senior AML (Anti-Money Laundering) Investigator. Your task is to compare the subject's KYC document with open-source adverse media search results and produce a structured Adverse Media Report.
-
-CRITICAL ANTI-HALLUCINATION RULE: You must ONLY cite and use the EXACT URLs provided in the search_results. If the search results are empty, irrelevant, or contain garbage links, state clearly that no valid adverse media was found and assess the risk as Low. DO NOT make up, guess, or invent URLs.
-
-Subject under review: {entity_name}
+        report = self.llm.invoke(self._risk_prompt(entity_name, pdf_context, search_results))
+        out = _llm_response_text(report) + self._sources_section(search_results)
+        logger.info("Risk analysis completed for entity: %s", entity_name)
+        return out
 
----
-KYC / Document context (from PDF):
----
-{pdf_context}
----
+    def screen_document(
+        self,
+        document_text: str,
+        search_results: list[dict[str, Any]],
+        search_subject: str,
+    ) -> KYCReport:
+        """
+        Extract the entity and assess adverse media risk in a single JSON-mode call.
 
----
-Adverse media search results (OSINT):
----
-{search_results}
----
+        Replaces extract_entity_from_text + analyze_risk when the search can
+        run before extraction (e.g. on guess_search_seed): the document is
+        sent to the LLM once instead of twice. Runs on model_name (like
+        analyze_risk), not accuracy_model_name. Render the result with
+        render_kyc_report. Callers should check that report.entity matches
+        search_subject and fall back to the two-call flow if it does not.
 
-Write a structured Adverse Media Report containing the following sections. Use clear headings and bullet points where appropriate.
+        Args:
+            document_text: Document text (e.g. from extract_pdf_text).
+            search_results: Text-result dicts from search_adverse_media.
+            search_subject: The name the search was run for.
 
-1. Executive Summary
-   - Brief overview of the subject and whether any adverse findings appear to relate to them.
+        Returns:
+            Validated KYCReport. Findings and sources whose URLs are not in
+            search_results are dropped (counted in dropped_findings); a risk
+            above Low with no remaining true-positive finding is flagged via
+            KYCReport.unverified.
 
-2. True Positive / False Positive Assessment
-   - Does the news or content in the search results actually refer to the same person or company described in the PDF? Or are these likely different individuals/entities (false positives)? Explain your reasoning.
+        Raises:
+            ValueError: If the LLM output does not validate as a KYCReport.
+        """
+        response = self.report_json_llm.invoke(_SCREENING_PROMPT.format(
+            document_text=document_text,
+            search_subject=search_subject,
+            search_results=self._search_blob(search_results),
+            format_instructions=_REPORT_FORMAT_INSTRUCTIONS,
+        ))
+        raw = _llm_response_text(response)
+        try:
+            report = KYCReport.model_validate_json(raw)
+        except Exception as e:
+            logger.exception("LLM output did not parse as KYCReport: %s", raw[:200])
+            raise ValueError(f"Screening failed: {e}") from e
+        # Enforce the anti-hallucination rule locally: only URLs we actually retrieved
+        known_urls = {r.get("url", "").strip() for r in search_results if r.get("url")}
+        findings = [f for f in report.findings if f.source_url.strip() in known_urls]
+        report.dropped_findings = len(report.findings) - len(findings)
+        report.findings = findings
+        report.sources = [u for u in dict.fromkeys(u.strip() for u in report.sources) if u in known_urls]
+        if report.dropped_findings:
+            logger.warning(
+                "Discarded %d finding(s) citing URLs not in the search results",
+                report.dropped_findings,
+            )
+        if report.unverified:
+            logger.warning(
+                "Risk rated %s without a sourced true-positive finding; report marked unverified",
+                report.risk_level,
+            )
+        logger.info("Single-pass screening completed for entity: %s", report.entity.subject_name)
+        return report
 
-3. Key Findings (with sources)
-   - List each relevant finding with the source URL. If none are true positives, state that clearly.
+    def analyze_risk_stream(
+        self,
+        entity_name: str,
+        pdf_context: str,
+        search_results: list[dict[str, Any]],
+    ) -> Iterator[str]:
+        """
+        Streaming variant of analyze_risk: yields report text as the LLM generates it.
 
-4. Risk Level
-   - Conclude with one of: High, Medium, or Low. Justify based on the true positive findings and their severity.
+        Takes the same arguments as analyze_risk. The Sources & References
+        section is yielded as a final chunk once generation completes, so
+        "".join(...) gives the same report as analyze_risk (modulo surrounding
+        whitespace, which is not stripped mid-stream).
 
-5. Sources & References
-   - List every source URL used in your findings (from the search results provided). One URL per line for human review.
+        Yields:
+            Report text chunks, suitable for st.write_stream or stdout.
+        """
+        prompt = self._risk_prompt(entity_name, pdf_context, search_results)
+        started = False
+        for chunk in self.llm.stream(prompt):
+            text = _llm_chunk_text(chunk)
+            if not started:
+                # Match analyze_risk, which strips leading whitespace
+                text = text.lstrip()
+                started = bool(text)
+            if text:
+                yield text
+        sources = self._sources_section(search_results)
+        if sources:
+            yield sources
+        logger.info("Risk analysis completed for entity: %s", entity_name)
 
-Output the full report only. No meta-commentary before or after."""
+    @staticmethod
+    def _risk_prompt(
+        entity_name: str,
+        pdf_context: str,
+        search_results: list[dict[str, Any]],
+    ) -> str:
+        """Render the risk prompt (search results formatted as a text blob)."""
+        return _RISK_PROMPT.format(
+            document_text=pdf_context,
+            entity_name=entity_name,
+            search_results=AdverseMediaAgent._search_blob(search_results),
         )
-        chain = prompt | self.llm
-        report = chain.invoke({
-            "entity_name": entity_name,
-            "pdf_context": pdf_context,
-            "search_results": search_blob,
-        })
-        out = _llm_response_text(report)
-        # Explicit Sources & References section from search_results URLs
-        urls = [r.get("href", "").strip() for r in (search_results or []) if r.get("href")]
-        if urls:
-            out += "\n\n---\n\n## Sources & References\n\n"
-            for u in urls:
-                out += f"- {u}\n"
-        logger.info("Risk analysis completed for entity: %s", entity_name)
-        return out
+
+    @staticmethod
+    def _search_blob(search_results: list[dict[str, Any]]) -> str:
+        """Format search results as the text blob embedded in the LLM prompts."""
+        if not search_results:
+            return "(No adverse media search results available.)"
+        # List (not generator): str.join materializes its input anyway
+        return "\n\n".join([
+            f"Title: {r.get('title', '')}\nURL: {r.get('url', '')}\nSummary: {r.get('content', '')}"
+            for r in search_results
+        ])
+
+    @staticmethod
+    def _sources_section(search_results: list[dict[str, Any]]) -> str:
+        """Explicit Sources & References section from search_results URLs ("" if none)."""
+        urls = [r.get("url", "").strip() for r in (search_results or []) if r.get("url")]
+        if not urls:
+            return ""
+        return "".join(["\n\n---\n\n## Sources & References\n\n", *[f"- {u}\n" for u in urls]])
@@ -7,14 +7,22 @@ OSINT search, and LLM-based risk report. All processing is local.
 
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-import fitz
-
-from core import AdverseMediaAgent
+from core import AdverseMediaAgent, entity_name_matches, guess_search_seed, render_kyc_report
 
 # Target PDF to screen (place in project root or set full path)
 PDF_PATH = "dummy_profile.pdf"
 
+# PDFs up to this size are read into memory once and parsed from the buffer;
+# larger ones are opened by path so memory stays bounded
+MAX_PDF_BYTES = 50 * 1024 * 1024
+
+# One fused extraction + risk call (document prefilled once) when the PDF has a
+# labelled subject name to search on; False always uses the two-call streamed report
+SINGLE_PASS = True
+
 # ASCII banner for the final report
 REPORT_BANNER = """
 ================================================================================
@@ -23,16 +31,6 @@ REPORT_BANNER = """
 """
 
 
-def load_pdf_context(pdf_path: str) -> str:
-    """Extract full text from PDF for use as context in risk analysis."""
-    doc = fitz.open(pdf_path)
-    try:
-        chunks = [page.get_text() for page in doc]
-        return "\n".join(chunks).strip() or "(No text extracted)"
-    finally:
-        doc.close()
-
-
 def main() -> None:
     if not os.path.exists(PDF_PATH):
         print(f"Error: PDF file not found: {PDF_PATH}", file=sys.stderr)
@@ -43,21 +41,69 @@ def main() -> None:
     agent = AdverseMediaAgent()
 
     print("\n[1/3] Extracting entity from PDF...")
-    entity_name = agent.extract_entity_from_pdf(PDF_PATH)
-    print(f"      Entity identified: {entity_name}")
+    # Single PyMuPDF pass: the same text drives extraction and the risk-analysis context
+    pdf_path = Path(PDF_PATH)
+    pdf_source = pdf_path.read_bytes() if pdf_path.stat().st_size <= MAX_PDF_BYTES else pdf_path
+    pdf_context = agent.extract_pdf_text(pdf_source)
+    seed = guess_search_seed(pdf_context)
+    if SINGLE_PASS and seed:
+        if _screen_single_pass(agent, pdf_context, seed):
+            return
+        print("\n[1/3] Extracting entity from PDF (two-call flow)...")
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        # Speculative Tavily search on a labelled name, overlapping the extraction LLM call
+        seed_search = pool.submit(agent.search_adverse_media, seed) if seed else None
+        extracted = agent.extract_entity_from_text(pdf_context)
+        entity_name = extracted["subject_name"]
+        print(f"      Entity identified: {entity_name}")
+
+        print("\n[2/3] Searching OSINT sources for adverse media...")
+        if seed_search and entity_name_matches(entity_name, seed):
+            search_data = seed_search.result()
+            print(f"      Reused speculative search for: {seed}")
+        else:
+            search_data = agent.search_adverse_media(entity_name)
+    print(f"      Retrieved {len(search_data['results'])} result(s).")
 
+    print("\n[3/3] Analyzing risk (Senior AML Investigator)...")
+    print(REPORT_BANNER)
+    # Print the report as the LLM generates it instead of waiting for the full text
+    for chunk in agent.analyze_risk_stream(entity_name, pdf_context, search_data["results"]):
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+    print("\n================================================================================\n")
+
+
+def _screen_single_pass(agent: AdverseMediaAgent, pdf_context: str, seed: str) -> bool:
+    """
+    Search on the seed name first, then extract + assess in one LLM call.
+
+    Returns False, without printing a report, if the model output does not
+    validate or the extracted subject does not match the seed; the caller then
+    runs the two-call flow (the seed search is served from the OSINT cache).
+    """
+    print(f"      Subject label found: {seed}")
     print("\n[2/3] Searching OSINT sources for adverse media...")
-    search_results = agent.search_adverse_media(entity_name)
-    print(f"      Retrieved {len(search_results)} result(s).")
-
-    pdf_context = load_pdf_context(PDF_PATH)
+    search_data = agent.search_adverse_media(seed)
+    print(f"      Retrieved {len(search_data['results'])} result(s).")
 
-    print("\n[3/3] Analyzing risk (Senior AML Investigator)...")
-    report = agent.analyze_risk(entity_name, pdf_context, search_results)
+    print("\n[3/3] Extracting entity and analyzing risk (single pass)...")
+    try:
+        report = agent.screen_document(pdf_context, search_data["results"], seed)
+    except ValueError as e:
+        print(f"      Single-pass screening failed ({e}); falling back to extraction + report.")
+        return False
+    entity_name = report.entity.subject_name
+    print(f"      Entity identified: {entity_name}")
+    # Findings come from a search for the seed, so accept them only for that exact name
+    if not entity_name_matches(entity_name, seed):
+        print("      Seed did not match the extracted subject; falling back to extraction + report.")
+        return False
 
     print(REPORT_BANNER)
-    print(report)
+    print(render_kyc_report(report))
     print("================================================================================\n")
+    return True
 
 
 if __name__ == "__main__":